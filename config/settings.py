@@ -1,42 +1,67 @@
 # config/settings.py
 import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Config:
-    DEBUG = os.getenv('DEBUG', 'False').lower() in ('true', '1', 't')
-    TESSERACT_PATH = os.getenv('TESSERACT_PATH')
-    MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'best.pt')
-    DATABASE_URL = "sqlite:///license_plate_system.db"
+    DEBUG: bool = os.getenv('DEBUG', 'False').lower() in ('true', '1', 't')
+    ROI_DEBUG: bool = os.getenv('ROI_DEBUG', 'False').lower() in ('true', '1', 't')  # Per-detection intersection dumps
+    TESSERACT_PATH: Optional[str] = os.getenv('TESSERACT_PATH')
+    MODEL_PATH: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'best.pt')
+    ENGINE_PATH: str = field(init=False)  # Cached TensorRT export, next to MODEL_PATH
+    USE_TENSORRT: bool = os.getenv('USE_TENSORRT', 'True').lower() in ('true', '1', 't')
+    TENSORRT_INT8: bool = os.getenv('TENSORRT_INT8', 'False').lower() in ('true', '1', 't')
+    TENSORRT_CALIBRATION_DATA: Optional[str] = os.getenv('TENSORRT_CALIBRATION_DATA')  # Dataset YAML for INT8
+    DATABASE_URL: str = "sqlite:///license_plate_system.db"
+    DB_FLUSH_INTERVAL: float = 1.0  # Seconds between write-behind flushes
+    DB_FLUSH_BATCH_SIZE: int = 100  # Pending records that trigger an early flush
     
     # OCR Settings
-    OCR_CONFIDENCE_THRESHOLD = 40  # Minimum confidence for valid plate
-    ALLOWED_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    OCR_CONFIDENCE_THRESHOLD: float = 40  # Minimum confidence for valid plate
+    ALLOWED_CHARS: str = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    OCR_PLATE_HEIGHT: int = 48  # Plates taller than this are downsampled before OCR
+    OCR_BATCH_WIDTH: int = 144  # Plate crops are resized to this for batched EasyOCR
+    OCR_BATCH_HEIGHT: int = field(init=False)  # Same as OCR_PLATE_HEIGHT
     
     # Detection Settings
-    DETECTION_CONFIDENCE_THRESHOLD = 0.4  # Lowered to catch more plates0.6
-    MIN_PLATE_LENGTH = 3  # Minimum number of characters in plate
-    MAX_PLATE_LENGTH = 10  # Maximum number of characters in plate
-    NMS_THRESHOLD = 0.3  # NMS threshold for removing duplicate detections
+    DETECTION_CONFIDENCE_THRESHOLD: float = 0.4  # Lowered to catch more plates0.6
+    MIN_PLATE_LENGTH: int = 3  # Minimum number of characters in plate
+    MAX_PLATE_LENGTH: int = 10  # Maximum number of characters in plate
+    NMS_THRESHOLD: float = 0.2  # NMS threshold for removing duplicate detections0.3
+    DETECTION_BATCH_SIZE: int = 4  # Frames per YOLO forward pass
+    MAX_DETECTION_BATCH_SIZE: int = 16  # Hard cap on frames per forward pass
+    DETECTION_IMAGE_SIZE: int = 640  # Square letterbox size fed to YOLO
+    MAX_DETECTIONS: int = 50  # Maximum boxes kept per frame after NMS
+    CAPTURE_FRAMERATE: Optional[int] = int(os.getenv('CAPTURE_FRAMERATE')) if os.getenv('CAPTURE_FRAMERATE') else None  # Decimate stream/file sources in GStreamer
     
     
     # Plate Processing Thresholds
-    SAVE_THRESHOLD = 75.0  # Save and process plate above this confidence60
-    LOCK_THRESHOLD = 80.0  # Lock plate reading above this confidence90
+    SAVE_THRESHOLD: float = 75.0  # Save and process plate above this confidence60
+    LOCK_THRESHOLD: float = 80.0  # Lock plate reading above this confidence90
     
     # ROI Settings
-    ROI_INTERSECTION_THRESHOLD = 0.2  # Lowered for more lenient intersection0.3
+    ROI_INTERSECTION_THRESHOLD: float = 0.2  # Lowered for more lenient intersection0.3
     
     # Tracking Settings
-    TRACK_COLORS = {
+    TRACK_COLORS: Dict[str, Tuple[int, int, int]] = field(default_factory=lambda: {
         'TRACKING': (0, 255, 255),  # Yellow
         'LOCKED': (0, 255, 0)       # Green
-    }
-    MAX_TRACK_AGE = 3.0  # Maximum time to keep a track (seconds)
-    POSITION_THRESHOLD = 100  # Maximum distance for track matching
-    MAX_TRACK_AGE = 2.0
-    VELOCITY_THRESHOLD = 50.0  # Maximum velocity for track matching
-    SMOOTHING_FACTOR = 0.7  # Smoothing factor for Kalman Filter
-    MIN_CONFIDENCE_DIFFERENCE = 5.0  # Minimum confidence difference for OCR update
-    MIN_TRACK_CONFIDENCE = 0.3  # Minimum confidence to start tracking
\ No newline at end of file
+    })
+    MAX_TRACK_AGE: float = 3.0  # Maximum time to keep a track (seconds)
+    POSITION_THRESHOLD: float = 100  # Maximum distance for track matching
+    VELOCITY_THRESHOLD: float = 50.0  # Maximum velocity for track matching
+    SMOOTHING_FACTOR: float = 0.7  # Smoothing factor for Kalman Filter
+    MIN_CONFIDENCE_DIFFERENCE: float = 5.0  # Minimum confidence difference for OCR update
+    MIN_TRACK_CONFIDENCE: float = 0.3  # Minimum confidence to start tracking
+
+    def __post_init__(self):
+        # Derived values, frozen like everything else
+        object.__setattr__(self, 'ENGINE_PATH', os.path.splitext(self.MODEL_PATH)[0] + '.engine')
+        object.__setattr__(self, 'OCR_BATCH_HEIGHT', self.OCR_PLATE_HEIGHT)
+
+# Read once at import, shared by every module
+CONFIG = Config()
\ No newline at end of file
@@ -1,36 +1,96 @@
 from ultralytics import YOLO
+from ultralytics.nn.autobackend import AutoBackend
+from ultralytics.utils import ops
+import torch
 import cv2
 import numpy as np
-from config.settings import Config
+from config.settings import CONFIG
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
 import time
 from typing import Dict, List, Tuple, Optional
 
+logger = logging.getLogger('detector')
+
 class VehicleDetector:
     def __init__(self):
         try:
             print("Initializing VehicleDetector...")
-            self.model = YOLO(Config.MODEL_PATH)
-            print(f"YOLO model loaded from: {Config.MODEL_PATH}")
+            self.model = YOLO(CONFIG.MODEL_PATH)
+            print(f"YOLO model loaded from: {CONFIG.MODEL_PATH}")
             self.conf_threshold = 0.5
             
+            # Raw forward pass over a preallocated batch tensor
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            self.imgsz = CONFIG.DETECTION_IMAGE_SIZE
+            weights = self._load_weights()
+            # A TensorRT engine fixes its own input dtype, only cast the PyTorch model to FP16
+            is_engine = isinstance(weights, str)
+            self.backend = AutoBackend(weights, device=self.device,
+                                       fp16=self.device.type == 'cuda' and not is_engine,
+                                       verbose=False)
+            # Input dtype follows what the loaded backend actually expects
+            self.half = self.backend.fp16
+            
+            # Letterboxed BGR frames are staged as uint8 NHWC in pinned host memory
+            # and copied to the device in a single transfer per batch
+            staging_shape = (CONFIG.MAX_DETECTION_BATCH_SIZE, self.imgsz, self.imgsz, 3)
+            self.pinned = torch.full(staging_shape, 114, dtype=torch.uint8,
+                                     pin_memory=self.device.type == 'cuda')
+            self.dev = torch.empty_like(self.pinned, device=self.device)
+            self.staged_shapes = [None] * CONFIG.MAX_DETECTION_BATCH_SIZE
+            
             self.classes = {
                 0: 'license_plate',
                 1: 'wheel'
             }
             
-            # Prevent OpenCV windows
-            cv2.setNumThreads(1)
-            cv2.ocl.setUseOpenCL(False)
+            # Background writer for debug images
+            self._io_pool = ThreadPoolExecutor(max_workers=2)
             
             print("Detector initialization complete")
         except Exception as e:
             print(f"Error in detector initialization: {str(e)}")
             raise e
 
+    def _load_weights(self):
+        """Prefer a cached TensorRT engine on CUDA hosts, exporting it on first run"""
+        if not (CONFIG.USE_TENSORRT and self.device.type == 'cuda'):
+            return self.model.model
+        
+        if os.path.exists(CONFIG.ENGINE_PATH):
+            print(f"Using TensorRT engine: {CONFIG.ENGINE_PATH}")
+            return CONFIG.ENGINE_PATH
+        
+        try:
+            int8 = CONFIG.TENSORRT_INT8 and CONFIG.TENSORRT_CALIBRATION_DATA is not None
+            if CONFIG.TENSORRT_INT8 and not int8:
+                print("TENSORRT_INT8 needs TENSORRT_CALIBRATION_DATA, exporting FP16 instead")
+            
+            print("Exporting YOLO model to TensorRT, this only happens once...")
+            engine_path = self.model.export(
+                format='engine',
+                half=not int8,
+                int8=int8,
+                data=CONFIG.TENSORRT_CALIBRATION_DATA if int8 else None,
+                dynamic=True,
+                batch=CONFIG.MAX_DETECTION_BATCH_SIZE,
+                imgsz=self.imgsz,
+                device=self.device.index or 0
+            )
+            print(f"TensorRT engine saved to: {engine_path}")
+            return engine_path
+        
+        except Exception as e:
+            print(f"TensorRT export failed, falling back to PyTorch: {str(e)}")
+            return self.model.model
+
     def assign_wheels_to_vehicle(self, plate_bbox: Tuple[int, int, int, int],
-                               wheels: List[Dict]) -> int:
+                               wheels_xy: np.ndarray) -> int:
         """
         Enhanced wheel/axle counting logic
+        wheels_xy is a (W, 2) array of wheel centers for the frame
         Returns total number of axles
         """
         try:
@@ -43,36 +103,17 @@ class VehicleDetector:
             vehicle_left = max(0, plate_center_x - vehicle_width/2)
             vehicle_right = plate_center_x + vehicle_width/2
             
-            # Group wheels by vertical position (axles)
-            axle_groups = []
             MAX_VERTICAL_DIST = plate_height * 0.5  # Max vertical distance for same axle
             
-            for wheel in wheels:
-                wheel_bbox = wheel['bbox']
-                wheel_center = (
-                    (wheel_bbox[0] + wheel_bbox[2]) / 2,
-                    (wheel_bbox[1] + wheel_bbox[3]) / 2
-                )
-                
-                # Only consider wheels below plate and within vehicle bounds
-                if (wheel_center[1] > plate_y and 
-                    vehicle_left <= wheel_center[0] <= vehicle_right):
-                    
-                    # Try to add to existing axle group
-                    added_to_group = False
-                    for group in axle_groups:
-                        group_y = sum(w[1] for w in group) / len(group)
-                        if abs(wheel_center[1] - group_y) < MAX_VERTICAL_DIST:
-                            group.append(wheel_center)
-                            added_to_group = True
-                            break
-                    
-                    # Create new axle group if needed
-                    if not added_to_group:
-                        axle_groups.append([wheel_center])
-            
-            # Count axles (groups with at least one wheel)
-            num_axles = len([g for g in axle_groups if len(g) >= 1])
+            # Only consider wheels below plate and within vehicle bounds
+            mask = ((wheels_xy[:, 1] > plate_y) &
+                    (wheels_xy[:, 0] >= vehicle_left) &
+                    (wheels_xy[:, 0] <= vehicle_right))
+            
+            # Group wheels by vertical position (axles): a new axle starts
+            # wherever consecutive sorted y-coords are too far apart
+            ys = np.sort(wheels_xy[mask, 1])
+            num_axles = 1 + np.count_nonzero(np.diff(ys) >= MAX_VERTICAL_DIST) if ys.size else 0
             
             # Ensure minimum of 2 axles
             num_axles = max(2, num_axles)
@@ -80,7 +121,7 @@ class VehicleDetector:
             # Cap at reasonable maximum
             num_axles = min(num_axles, 8)
             
-            print(f"Detected {num_axles} axles for vehicle at {plate_bbox}")
+            logger.debug("Detected %d axles for vehicle at %s", num_axles, plate_bbox)
             return num_axles
             
         except Exception as e:
@@ -88,70 +129,120 @@ class VehicleDetector:
             return 2  # Default to 2 axles on error
 
     def detect_and_track(self, frame):
-        try:
-            print("\nProcessing new frame...")
-            results = self.model.predict(
-                source=frame,
-                conf=self.conf_threshold,
-                verbose=False,
-                show=False  # Ensure no display window
-            )
-            print("YOLO detection completed")
-            
-            plates = []
-            wheels = []
-            
-            if results and len(results) > 0:
-                result = results[0]
+        """Detect plates and wheels in a single frame"""
+        return self.detect_and_track_batch([frame])[0]
+
+    def detect_and_track_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Run YOLO once over a batch of frames
+        Returns one list of plate detections per input frame
+        """
+        batch_detections = [[] for _ in frames]
+        
+        for start in range(0, len(frames), CONFIG.MAX_DETECTION_BATCH_SIZE):
+            chunk = frames[start:start + CONFIG.MAX_DETECTION_BATCH_SIZE]
+            try:
+                logger.debug("Processing batch of %d frames...", len(chunk))
+                host_preds = self._forward(chunk)
+                logger.debug("YOLO detection completed")
                 
-                if result.boxes is not None:
-                    boxes = result.boxes
-                    
-                    # Separate plates and wheels
-                    for i, box in enumerate(boxes):
-                        try:
-                            class_id = int(box.cls[0])
-                            xyxy = box.xyxy[0].tolist()
-                            x1, y1, x2, y2 = map(int, xyxy)
-                            confidence = float(box.conf[0])
-                            
-                            detection = {
-                                'bbox': (x1, y1, x2, y2),
-                                'confidence': confidence,
-                                'class': self.classes[class_id]
-                            }
-                            
-                            if class_id == 0:  # License plate
-                                detection['track_id'] = len(plates)
-                                plates.append(detection)
-                            elif class_id == 1:  # Wheel
-                                wheels.append(detection)
-                                
-                        except Exception as e:
-                            print(f"Error processing box: {str(e)}")
-                            continue
-                    
-                    # Apply NMS to plates
-                    filtered_plates = self.apply_nms(plates)
-                    
-                    # Process each plate
-                    for plate in filtered_plates:
-                        # Count wheels for this plate
-                        axle_count = self.assign_wheels_to_vehicle(plate['bbox'], wheels)
-                        plate['axle_count'] = axle_count
-                        print(f"Vehicle with plate at {plate['bbox']} has {axle_count} axles")
-                    
-                    return filtered_plates
-            
-            print("No detections found")
-            return []
+                for offset, det in enumerate(host_preds):
+                    frame_idx = start + offset
+                    batch_detections[frame_idx] = self._parse_result(det, frame_idx)
+            
+            except Exception as e:
+                print(f"Detection Error: {str(e)}")
         
-        except Exception as e:
-            print(f"Detection Error: {str(e)}")
+        return batch_detections
+
+    def _letterbox(self, frame: np.ndarray, slot: int) -> None:
+        """Resize frame into the pinned staging slot, keeping aspect ratio"""
+        h, w = frame.shape[:2]
+        r = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * r)), int(round(h * r))
+        top = (self.imgsz - new_h) // 2
+        left = (self.imgsz - new_w) // 2
+        
+        staging = self.pinned[slot].numpy()
+        if self.staged_shapes[slot] != (h, w):
+            # Padding only needs resetting when the frame geometry changes
+            staging.fill(114)
+            self.staged_shapes[slot] = (h, w)
+        
+        cv2.resize(frame, (new_w, new_h),
+                   dst=staging[top:top + new_h, left:left + new_w],
+                   interpolation=cv2.INTER_LINEAR)
+
+    @torch.inference_mode()
+    def _forward(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """Run YOLO on staged frames, returns (N, 6) xyxy/conf/cls host arrays per frame"""
+        n = len(frames)
+        for i, frame in enumerate(frames):
+            self._letterbox(frame, i)
+        
+        self.dev[:n].copy_(self.pinned[:n], non_blocking=True)
+        
+        # NHWC BGR uint8 -> NCHW RGB float in [0, 1]
+        x = self.dev[:n].permute(0, 3, 1, 2).flip(1)
+        x = x.half() if self.half else x.float()
+        x /= 255
+        
+        preds = ops.non_max_suppression(
+            self.backend(x),
+            conf_thres=self.conf_threshold,
+            iou_thres=CONFIG.NMS_THRESHOLD,
+            max_det=CONFIG.MAX_DETECTIONS
+        )
+        
+        # Rescale on the device, still in inference mode since NMS returns inference
+        # tensors, then sync the surviving boxes back once per batch
+        for frame, det in zip(frames, preds):
+            det[:, :4] = ops.scale_boxes((self.imgsz, self.imgsz), det[:, :4], frame.shape)
+        
+        counts = np.cumsum([len(det) for det in preds])[:-1]
+        return np.split(torch.cat(preds).cpu().numpy(), counts)
+
+    def _parse_result(self, det: np.ndarray, frame_idx: int) -> List[Dict]:
+        """Convert a single frame's (N, 6) YOLO output into plate detections with axle counts"""
+        if len(det) == 0:
+            logger.debug("No detections found")
             return []
+        
+        xyxy = det[:, :4].astype(int)
+        scores = det[:, 4]
+        class_ids = det[:, 5].astype(int)
+        
+        # Separate plates and wheels
+        plate_idx = np.flatnonzero(class_ids == 0)
+        wheel_idx = np.flatnonzero(class_ids == 1)
+        
+        # Wheel centers, built once per frame for axle counting
+        wheel_boxes = xyxy[wheel_idx]
+        wheels_xy = np.column_stack((
+            (wheel_boxes[:, 0] + wheel_boxes[:, 2]) * 0.5,
+            (wheel_boxes[:, 1] + wheel_boxes[:, 3]) * 0.5
+        ))
+        
+        plates = []
+        for track_id, i in enumerate(plate_idx):
+            plate = {
+                'bbox': tuple(xyxy[i].tolist()),
+                'confidence': float(scores[i]),
+                'class': self.classes[0],
+                'frame_idx': frame_idx,
+                'track_id': track_id
+            }
+            
+            # Count wheels for this plate
+            axle_count = self.assign_wheels_to_vehicle(plate['bbox'], wheels_xy)
+            plate['axle_count'] = axle_count
+            logger.debug("Vehicle with plate at %s has %d axles", plate['bbox'], axle_count)
+            plates.append(plate)
+        
+        return plates
 
     def extract_plate(self, frame, bbox):
-        """Extract license plate region from frame"""
+        """Extract license plate region from frame (returned as a view)"""
         try:
             x1, y1, x2, y2 = bbox
             # Add padding around the plate
@@ -162,54 +253,16 @@ class VehicleDetector:
             x2 = min(w, x2 + padding)
             y2 = min(h, y2 + padding)
             
-            plate_img = frame[y1:y2, x1:x2].copy()
+            # View into the frame, the tracker copies it only if it keeps the read
+            plate_img = frame[y1:y2, x1:x2]
             
-            # Save debug image
-            debug_path = f"debug_plates/raw_plate_{int(time.time()*1000)}.jpg"
-            cv2.imwrite(debug_path, plate_img)
-            print(f"Saved raw plate to {debug_path}")
+            # Save debug image off the hot path
+            if CONFIG.DEBUG:
+                debug_path = f"debug_plates/raw_plate_{int(time.time()*1000)}.jpg"
+                self._io_pool.submit(cv2.imwrite, debug_path, plate_img.copy())
+                logger.debug("Saving raw plate to %s", debug_path)
             
             return plate_img
         except Exception as e:
             print(f"Plate extraction error: {str(e)}")
             return None
-
-    def apply_nms(self, detections, iou_threshold=0.2):
-        """Apply Non-Maximum Suppression to remove overlapping detections"""
-        try:
-            if not detections:
-                return []
-            
-            boxes = []
-            scores = []
-            for det in detections:
-                boxes.append([
-                    det['bbox'][0], det['bbox'][1],
-                    det['bbox'][2], det['bbox'][3]
-                ])
-                scores.append(det['confidence'])
-            
-            boxes = np.array(boxes)
-            scores = np.array(scores)
-            
-            # Apply NMS
-            indices = cv2.dnn.NMSBoxes(
-                boxes.tolist(),
-                scores.tolist(),
-                self.conf_threshold,
-                iou_threshold
-            ).flatten()
-            
-            # Keep only non-overlapping detections
-            filtered_detections = [detections[i] for i in indices]
-            print(f"NMS: Reduced from {len(detections)} to {len(filtered_detections)} detections")
-            
-            # Ensure unique track IDs
-            for i, det in enumerate(filtered_detections):
-                det['track_id'] = i
-            
-            return filtered_detections
-        
-        except Exception as e:
-            print(f"Error in NMS: {str(e)}")
-            return detections
\ No newline at end of file
@@ -3,19 +3,28 @@ import pytesseract
 import easyocr
 import cv2
 import numpy as np
-from config.settings import Config
+from config.settings import CONFIG
 import time
 import os
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional
+
+# Translation table deleting every ASCII character that isn't a letter or digit
+_STRIP_NON_ALNUM = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if not chr(c).isalnum()
+))
 
 class OCREngine:
     def __init__(self):
         try:
             # Initialize both OCR engines
-            pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_PATH
-            self.tesseract_config = f'--psm 7 -c tessedit_char_whitelist={Config.ALLOWED_CHARS}'
+            pytesseract.pytesseract.tesseract_cmd = CONFIG.TESSERACT_PATH
+            self.tesseract_config = f'--psm 7 -c tessedit_char_whitelist={CONFIG.ALLOWED_CHARS}'
             self.easyocr_reader = easyocr.Reader(['en'])
             
+            # Runs Tesseract for low-confidence plates in parallel
+            self._ocr_pool = ThreadPoolExecutor(max_workers=2)
+            
             # Create debug directory
             os.makedirs("debug_plates", exist_ok=True)
             print("OCR Engine initialized successfully")
@@ -24,31 +33,80 @@ class OCREngine:
             print(f"Error initializing OCR engine: {str(e)}")
             raise e
 
-    def process_plate(self, plate_img: np.ndarray, track_id: int) -> Tuple[str, float]:
-        """Process with both OCR engines and return best result"""
+    def process_plates_batch(self, plate_imgs: List[np.ndarray],
+                             track_ids: List[int]) -> Tuple[List[str], List[float]]:
+        """
+        Process all plates with a single batched EasyOCR pass, then Tesseract
+        for the reads that are not confident enough to lock
+        Returns texts and confidences aligned with plate_imgs
+        """
+        texts = [""] * len(plate_imgs)
+        confidences = [0.0] * len(plate_imgs)
+        
         try:
-            if plate_img is None:
-                return "", 0
+            valid = [i for i, img in enumerate(plate_imgs) if img is not None]
+            if not valid:
+                return texts, confidences
+            
+            thresh_list = [self._binarize(plate_imgs[i]) for i in valid]
+            
+            try:
+                batch_results = self.easyocr_reader.readtext_batched(
+                    thresh_list,
+                    n_width=CONFIG.OCR_BATCH_WIDTH,
+                    n_height=CONFIG.OCR_BATCH_HEIGHT
+                )
+            except Exception as e:
+                print(f"EasyOCR batch error: {str(e)}")
+                batch_results = [[] for _ in valid]
+            
+            easyocr_reads = [self._merge_easyocr_results(results) for results in batch_results]
+            
+            # Tesseract is a subprocess and releases the GIL, so the remaining plates run in parallel
+            tesseract_futures = {
+                j: self._ocr_pool.submit(self._tesseract_ocr, thresh_list[j])
+                for j, (_, conf2) in enumerate(easyocr_reads)
+                if conf2 < CONFIG.LOCK_THRESHOLD
+            }
+            
+            for j, (i, (text2, conf2)) in enumerate(zip(valid, easyocr_reads)):
+                future = tesseract_futures.get(j)
+                texts[i], confidences[i] = self._pick_best(
+                    future.result() if future else None, text2, conf2
+                )
+            
+        except Exception as e:
+            print(f"Process plates batch error (tracks {track_ids}): {str(e)}")
+        
+        return texts, confidences
 
-            # Basic preprocessing
-            gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    def _binarize(self, plate_img: np.ndarray) -> np.ndarray:
+        """Basic preprocessing shared by both OCR engines"""
+        # Shrink to a fixed height first so colour conversion and Otsu touch fewer pixels
+        h, w = plate_img.shape[:2]
+        if h > CONFIG.OCR_PLATE_HEIGHT:
+            scale = CONFIG.OCR_PLATE_HEIGHT / h
+            plate_img = cv2.resize(plate_img, (max(1, int(w * scale)), CONFIG.OCR_PLATE_HEIGHT),
+                                   interpolation=cv2.INTER_AREA)
+        
+        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-            # Try both OCR engines
-            text1, conf1 = self._tesseract_ocr(thresh)
-            text2, conf2 = self._easyocr_ocr(thresh)
+    def _pick_best(self, tesseract_read: Optional[Tuple[str, float]], text2: str,
+                   conf2: float) -> Tuple[str, float]:
+        """Keep the EasyOCR read unless Tesseract ran and did better"""
+        if tesseract_read is None:
+            return self._clean_text(text2), conf2
+        
+        text1, conf1 = tesseract_read
 
-            # Choose result with higher confidence
-            if conf1 > conf2:
-                cleaned_text = self._clean_text(text1)
-                return cleaned_text, conf1
-            else:
-                cleaned_text = self._clean_text(text2)
-                return cleaned_text, conf2
-
-        except Exception as e:
-            print(f"Process plate error: {str(e)}")
-            return "", 0
+        # Choose result with higher confidence
+        if conf1 > conf2:
+            cleaned_text = self._clean_text(text1)
+            return cleaned_text, conf1
+        else:
+            cleaned_text = self._clean_text(text2)
+            return cleaned_text, conf2
 
     def _tesseract_ocr(self, image: np.ndarray) -> Tuple[str, float]:
         """Process image with Tesseract OCR"""
@@ -78,36 +136,20 @@ class OCREngine:
             print(f"Tesseract error: {str(e)}")
             return "", 0
 
-    def _easyocr_ocr(self, image: np.ndarray) -> Tuple[str, float]:
-        """Process image with EasyOCR"""
-        try:
-            results = self.easyocr_reader.readtext(image)
-            
-            if results:
-                text = "".join([result[1] for result in results])
-                confidence = sum(result[2] for result in results) / len(results) * 100
-                return text, confidence
-            
-            return "", 0
-            
-        except Exception as e:
-            print(f"EasyOCR error: {str(e)}")
-            return "", 0
+    def _merge_easyocr_results(self, results) -> Tuple[str, float]:
+        """Join EasyOCR text fragments and average their confidence"""
+        if results:
+            text = "".join([result[1] for result in results])
+            confidence = sum(result[2] for result in results) / len(results) * 100
+            return text, confidence
+        
+        return "", 0
 
     def _clean_text(self, text: str) -> str:
         """Clean and standardize OCR text"""
         # Remove any non-alphanumeric characters and convert to uppercase
-        cleaned = ''.join(c for c in text if c.isalnum()).upper()
-        
-        # Common OCR mistake corrections
-        replacements = {
-            '0': 'O',  # Replace zero with letter O
-            '1': 'I',  # Replace one with letter I
-            '5': 'S',  # Replace 5 with S
-            '8': 'B',  # Replace 8 with B
-        }
-        
-        for old, new in replacements.items():
-            cleaned = cleaned.replace(old, new)
+        cleaned = text.translate(_STRIP_NON_ALNUM).upper()
+        if not cleaned.isascii():
+            cleaned = ''.join(c for c in cleaned if c.isalnum())
         
         return cleaned
\ No newline at end of file
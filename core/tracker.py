@@ -4,10 +4,18 @@ from typing import Dict, List, Tuple, Optional
 import time
 import cv2
 import numpy as np
-from config.settings import Config
+from scipy.spatial import cKDTree
+from config.settings import CONFIG
 
 # core/tracker.py
 
+# Thresholds read on every detection, bound once at import
+_OCR_TH = CONFIG.OCR_CONFIDENCE_THRESHOLD
+_POS_TH = CONFIG.POSITION_THRESHOLD
+_POS_TH2 = CONFIG.POSITION_THRESHOLD ** 2
+_MIN_INDEXED_TRACKS = 8  # Below this a linear scan beats building a KD-tree
+_MAX_TRACK_AGE = CONFIG.MAX_TRACK_AGE
+
 @dataclass
 class VehicleTrack:
     track_id: int
@@ -39,9 +47,13 @@ class VehicleTrack:
         self.detection_confidence = max(self.detection_confidence, detection_confidence)
         self.max_axle_count = max(self.max_axle_count, axle_count)
 
+    def needs_ocr(self) -> bool:
+        """Cheap pre-check so locked tracks skip ROI, crop and OCR work"""
+        return not self.processing_complete and self.ocr_attempts < self.max_ocr_attempts
+
     def should_process(self, in_roi: bool) -> bool:
         """Only process if we haven't got a good read yet"""
-        if self.processing_complete or self.ocr_attempts >= self.max_ocr_attempts:
+        if not self.needs_ocr():
             return False
         
         return in_roi and self.detection_confidence > 0.5
@@ -54,9 +66,10 @@ class VehicleTrack:
             self.best_ocr_confidence = confidence
             self.license_plate = text
             if plate_image is not None:
-                self.best_plate_image = plate_image
+                # Crops are views into VideoCamera._stage_plate slots that the next batch reuses, keep our own copy
+                self.best_plate_image = plate_image.copy()
             
-            if confidence > Config.OCR_CONFIDENCE_THRESHOLD:
+            if confidence > _OCR_TH:
                 self.lock_plate()
                 return True
         
@@ -74,25 +87,55 @@ class VehicleTracker:
     def __init__(self):
         self.tracks: Dict[int, VehicleTrack] = {}
         self.next_id = 0
+        
+        # Per-frame spatial index over track centers
+        self._index: Optional[cKDTree] = None
+        self._indexed_tracks: List[VehicleTrack] = []
+        self._unindexed_tracks: List[VehicleTrack] = []
+
+    def build_index(self) -> None:
+        """Index current track centers, call once per frame before get_track"""
+        self._unindexed_tracks = []
+        self._indexed_tracks = [t for t in self.tracks.values() if t.last_bbox]
+        
+        if len(self._indexed_tracks) < _MIN_INDEXED_TRACKS:
+            self._index = None
+            return
+        
+        centers = np.array([
+            ((t.last_bbox[0] + t.last_bbox[2]) * 0.5, (t.last_bbox[1] + t.last_bbox[3]) * 0.5)
+            for t in self._indexed_tracks
+        ])
+        self._index = cKDTree(centers)
 
     def get_track(self, detection_id: int, bbox: Tuple[int, int, int, int],
                  detection_confidence: float, axle_count: int = 2) -> VehicleTrack:
         """Match detection to existing track or create new one"""
         # Calculate center of new detection
-        new_center = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+        new_cx = (bbox[0] + bbox[2]) * 0.5
+        new_cy = (bbox[1] + bbox[3]) * 0.5
+        
+        if self._index is not None:
+            # Nearest indexed track within the matching radius
+            _, idx = self._index.query((new_cx, new_cy), distance_upper_bound=_POS_TH)
+            if idx < len(self._indexed_tracks):
+                track = self._indexed_tracks[idx]
+                track.update_position(bbox, detection_confidence, axle_count)
+                return track
+            # Tracks created since the index was built are not in it yet
+            candidates = self._unindexed_tracks
+        else:
+            candidates = self.tracks.values()
         
         # Look for existing tracks
-        for track in self.tracks.values():
-            if track.last_bbox:
-                # Calculate center of existing track
-                old_center = ((track.last_bbox[0] + track.last_bbox[2]) / 2,
-                            (track.last_bbox[1] + track.last_bbox[3]) / 2)
-                
-                # Simple distance check
-                distance = ((new_center[0] - old_center[0]) ** 2 +
-                          (new_center[1] - old_center[1]) ** 2) ** 0.5
+        for track in candidates:
+            last_bbox = track.last_bbox
+            if last_bbox:
+                # Squared distance to center of existing track
+                dx = new_cx - (last_bbox[0] + last_bbox[2]) * 0.5
+                dy = new_cy - (last_bbox[1] + last_bbox[3]) * 0.5
                 
-                if distance < Config.POSITION_THRESHOLD:
+                if dx * dx + dy * dy < _POS_TH2:
                     track.update_position(bbox, detection_confidence, axle_count)
                     return track
         
@@ -101,9 +144,11 @@ class VehicleTracker:
         track.update_position(bbox, detection_confidence, axle_count)
         self.tracks[self.next_id] = track
         self.next_id += 1
+        if self._index is not None:
+            self._unindexed_tracks.append(track)
         return track
 
-    def cleanup_old_tracks(self, max_age: float = 3.0):
+    def cleanup_old_tracks(self, max_age: float = _MAX_TRACK_AGE):
         """Remove old tracks"""
         current_time = time.time()
         to_remove = []
@@ -1,14 +1,16 @@
 # database/db_operations.py
-from sqlalchemy import create_engine, event, Index, text
+from sqlalchemy import create_engine, event, Index, text, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 import time
 import logging
+import threading
+import atexit
 from datetime import datetime, timedelta
 from .models import Base, Vehicle
-from config.settings import Config
+from config.settings import CONFIG
 from sqlalchemy.sql import func
 
 class DatabaseManager:
@@ -18,6 +20,7 @@ class DatabaseManager:
         self.setup_session()
         self.setup_engine_events()
         self.create_indices()
+        self.start_write_behind()
 
     def setup_logging(self):
         self.logger = logging.getLogger('database')
@@ -30,14 +33,24 @@ class DatabaseManager:
 
     def initialize_engine(self):
         try:
+            # Pooled connections, so the write-behind thread and readers each get their
+            # own transaction; WAL lets readers run alongside the single writer
             self.engine = create_engine(
-                Config.DATABASE_URL,
-                poolclass=QueuePool,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30,
-                pool_recycle=1800
+                CONFIG.DATABASE_URL,
+                connect_args={'check_same_thread': False}
             )
+            
+            # Registered before create_all so every pooled connection gets the pragmas
+            @event.listens_for(self.engine, 'connect')
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.execute('PRAGMA busy_timeout=5000')
+                cursor.execute('PRAGMA temp_store=MEMORY')
+                cursor.execute('PRAGMA mmap_size=268435456')
+                cursor.close()
+            
             Base.metadata.create_all(self.engine)
         except Exception as e:
             self.logger.error(f"Failed to initialize database: {str(e)}")
@@ -55,14 +68,20 @@ class DatabaseManager:
                     CREATE INDEX IF NOT EXISTS idx_last_seen 
                     ON vehicles (last_seen)
                 """))
+                # Unique so batched upserts can use ON CONFLICT(track_id)
                 conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS idx_track 
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_track_unique 
                     ON vehicles (track_id)
                 """))
+                conn.execute(text("DROP INDEX IF EXISTS idx_track"))
                 conn.execute(text("""
                     CREATE INDEX IF NOT EXISTS idx_confidence 
                     ON vehicles (confidence)
                 """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_processed_first_seen 
+                    ON vehicles (processed, first_seen)
+                """))
                 conn.commit()
         except Exception as e:
             self.logger.error(f"Failed to create indices: {str(e)}")
@@ -89,39 +108,114 @@ class DatabaseManager:
         finally:
             session.close()
 
+    def start_write_behind(self):
+        """Buffer detections in memory and flush them from a background thread"""
+        self._pending: Dict[int, dict] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop, name='db-write-behind', daemon=True
+        )
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Stop the write-behind thread and flush anything still pending"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._flush_requested.set()
+        self._flush_thread.join(timeout=5)
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            self._flush_requested.wait(CONFIG.DB_FLUSH_INTERVAL)
+            self._flush_requested.clear()
+            self.flush()
+
+    def _merge_pending(self, record: dict) -> None:
+        """Fold a detection into the pending buffer, caller holds _pending_lock"""
+        existing = self._pending.get(record['track_id'])
+        if existing is None:
+            self._pending[record['track_id']] = record
+            return
+        
+        existing['total_detections'] += record['total_detections']
+        existing['last_seen'] = max(existing['last_seen'], record['last_seen'])
+        if record['confidence'] > existing['confidence']:
+            existing['confidence'] = record['confidence']
+            existing['license_plate'] = record['license_plate']
+            existing['best_frame_path'] = record['best_frame_path']
+            existing['axle_count'] = record['axle_count']
+
     def add_vehicle_detection(self, track_id: int, license_plate: str,
                             confidence: float, frame_path: Optional[str] = None,
                             axle_count: int = 2) -> bool:
         try:
-            with self.session_scope() as session:
-                existing = session.query(Vehicle)\
-                    .filter(Vehicle.track_id == track_id)\
-                    .first()
-                
-                if existing:
-                    existing.total_detections += 1
-                    existing.last_seen = datetime.utcnow()
-                    if confidence > existing.confidence:
-                        existing.confidence = confidence
-                        existing.license_plate = license_plate
-                        existing.best_frame_path = frame_path
-                        existing.axle_count = axle_count
-                else:
-                    vehicle = Vehicle(
-                        track_id=track_id,
-                        license_plate=license_plate,
-                        confidence=confidence,
-                        best_frame_path=frame_path,
-                        axle_count=axle_count
-                    )
-                    session.add(vehicle)
-                
-                return True
+            now = datetime.utcnow()
+            with self._pending_lock:
+                self._merge_pending({
+                    'track_id': track_id,
+                    'license_plate': license_plate,
+                    'confidence': confidence,
+                    'best_frame_path': frame_path,
+                    'axle_count': axle_count,
+                    'total_detections': 1,
+                    'processed': False,
+                    'first_seen': now,
+                    'last_seen': now
+                })
+                pending_count = len(self._pending)
+            
+            if pending_count >= CONFIG.DB_FLUSH_BATCH_SIZE:
+                self._flush_requested.set()
+            
+            return True
                 
         except Exception as e:
             self.logger.error(f"Error adding vehicle detection: {str(e)}")
             return False
 
+    def flush(self) -> None:
+        """Write all pending detections as batched upserts in one transaction"""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            records = list(self._pending.values())
+            self._pending = {}
+        
+        try:
+            with self.session_scope() as session:
+                for start in range(0, len(records), CONFIG.DB_FLUSH_BATCH_SIZE):
+                    chunk = records[start:start + CONFIG.DB_FLUSH_BATCH_SIZE]
+                    session.execute(self._upsert_statement(chunk))
+        
+        except Exception as e:
+            self.logger.error(f"Error flushing vehicle detections: {str(e)}")
+            # Put the records back so the next flush retries them
+            with self._pending_lock:
+                for record in records:
+                    self._merge_pending(record)
+
+    def _upsert_statement(self, records: List[dict]):
+        stmt = sqlite_insert(Vehicle).values(records)
+        excluded = stmt.excluded
+        better = excluded.confidence > Vehicle.confidence
+        
+        return stmt.on_conflict_do_update(
+            index_elements=[Vehicle.track_id],
+            set_={
+                'total_detections': Vehicle.total_detections + excluded.total_detections,
+                'last_seen': excluded.last_seen,
+                'confidence': case((better, excluded.confidence), else_=Vehicle.confidence),
+                'license_plate': case((better, excluded.license_plate), else_=Vehicle.license_plate),
+                'best_frame_path': case((better, excluded.best_frame_path), else_=Vehicle.best_frame_path),
+                'axle_count': case((better, excluded.axle_count), else_=Vehicle.axle_count)
+            }
+        )
+
     def get_recent_vehicles(self, minutes: int = 30) -> List[Dict]:
         try:
             with self.session_scope() as session:
@@ -151,22 +245,21 @@ class DatabaseManager:
     def get_statistics(self) -> Dict[str, Any]:
         try:
             with self.session_scope() as session:
-                total = session.query(Vehicle).count()
-                processed = session.query(Vehicle)\
-                    .filter_by(processed=True).count()
-                
-                avg_confidence = session.query(func.avg(Vehicle.confidence))\
-                    .scalar() or 0
+                cutoff = datetime.utcnow() - timedelta(hours=24)
                 
-                recent = session.query(Vehicle)\
-                    .filter(Vehicle.first_seen >= datetime.utcnow() - timedelta(hours=24))\
-                    .count()
+                # One pass over the table with conditional aggregates
+                total, processed, avg_confidence, recent = session.query(
+                    func.count(Vehicle.id),
+                    func.sum(case((Vehicle.processed, 1), else_=0)),
+                    func.avg(Vehicle.confidence),
+                    func.sum(case((Vehicle.first_seen >= cutoff, 1), else_=0))
+                ).one()
                 
                 return {
                     'total_vehicles': total,
-                    'processed_vehicles': processed,
-                    'average_confidence': float(avg_confidence),
-                    'vehicles_last_24h': recent
+                    'processed_vehicles': processed or 0,
+                    'average_confidence': float(avg_confidence or 0),
+                    'vehicles_last_24h': recent or 0
                 }
                 
         except Exception as e:
@@ -178,13 +271,25 @@ class DatabaseManager:
                 'vehicles_last_24h': 0
             }
 
-    def search_vehicles(self, plate_query: str) -> List[Dict]:
+    def search_vehicles(self, plate_query: str, contains: bool = False) -> List[Dict]:
+        """
+        Prefix search on license plates using idx_license_plate
+        Pass contains=True for a full substring scan
+        """
         try:
             with self.session_scope() as session:
-                vehicles = session.query(Vehicle)\
-                    .filter(Vehicle.license_plate.ilike(f'%{plate_query}%'))\
-                    .order_by(Vehicle.last_seen.desc())\
-                    .all()
+                query = session.query(Vehicle)
+                
+                if contains:
+                    query = query.filter(Vehicle.license_plate.ilike(f'%{plate_query}%'))
+                elif plate_query:
+                    # Plates are stored uppercase, so a range on the prefix is sargable
+                    prefix = plate_query.upper()
+                    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                    query = query.filter(Vehicle.license_plate >= prefix,
+                                         Vehicle.license_plate < upper_bound)
+                
+                vehicles = query.order_by(Vehicle.last_seen.desc()).all()
                 
                 return [{
                     'id': v.id,
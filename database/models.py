@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, create_engine, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
-from config.settings import Config
+from config.settings import CONFIG
 
 Base = declarative_base()
 
@@ -35,7 +35,7 @@ class Vehicle(Base):
 
 # Create tables
 def init_db():
-    engine = create_engine(Config.DATABASE_URL)
+    engine = create_engine(CONFIG.DATABASE_URL)
     Base.metadata.create_all(engine)
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+# tests/test_detector.py
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+    import torch
+    from core.detector import VehicleDetector
+except ImportError as e:
+    VehicleDetector = None
+    _IMPORT_ERROR = str(e)
+
+IMGSZ = 64
+
+class StubBackend:
+    """Raw YOLO head output: one plate and one wheel per image, (B, 4 + classes, anchors) xywh"""
+    fp16 = False
+
+    def __call__(self, x):
+        preds = torch.zeros((x.shape[0], 6, 2))
+        preds[:, :4, 0] = torch.tensor([32.0, 32.0, 20.0, 10.0])  # plate
+        preds[:, 4, 0] = 0.9
+        preds[:, :4, 1] = torch.tensor([32.0, 50.0, 8.0, 8.0])    # wheel
+        preds[:, 5, 1] = 0.8
+        return preds
+
+@unittest.skipIf(VehicleDetector is None, "detector dependencies not installed")
+class DetectAndTrackBatchTest(unittest.TestCase):
+    def setUp(self):
+        # Skip YOLO loading, everything past the weights is the real detector
+        detector = VehicleDetector.__new__(VehicleDetector)
+        detector.conf_threshold = 0.5
+        detector.device = torch.device('cpu')
+        detector.half = False
+        detector.imgsz = IMGSZ
+        detector.backend = StubBackend()
+        detector.pinned = torch.full((4, IMGSZ, IMGSZ, 3), 114, dtype=torch.uint8)
+        detector.dev = torch.empty_like(detector.pinned)
+        detector.staged_shapes = [None] * 4
+        detector.classes = {0: 'license_plate', 1: 'wheel'}
+        detector._io_pool = ThreadPoolExecutor(max_workers=1)
+        self.detector = detector
+
+    def test_batch_returns_rescaled_plates_per_frame(self):
+        frames = [np.zeros((128, 128, 3), np.uint8) for _ in range(3)]
+        results = self.detector.detect_and_track_batch(frames)
+        
+        self.assertEqual(len(results), 3)
+        for frame_idx, detections in enumerate(results):
+            self.assertEqual(len(detections), 1)
+            plate = detections[0]
+            self.assertEqual(plate['class'], 'license_plate')
+            self.assertEqual(plate['frame_idx'], frame_idx)
+            # 64px letterbox of a 128px frame, boxes come back at 2x
+            self.assertEqual(plate['bbox'], (44, 54, 84, 74))
+            self.assertGreaterEqual(plate['axle_count'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
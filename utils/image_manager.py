@@ -1,16 +1,18 @@
 from pathlib import Path
+import os
+import stat
 import asyncio
 import aiofiles
 import aiofiles.os as async_os
 from datetime import datetime, timedelta
-import redis
-from typing import Optional
+from redis import asyncio as aioredis
+from typing import List, Optional
 import json
 import cv2
 
 class ImageManager:
     def __init__(self):
-        self.redis_client = redis.Redis(host='localhost', port=6379, db=1)
+        self.redis_client = aioredis.Redis(host='localhost', port=6379, db=1)
         self.cache_ttl = 3600  # 1 hour
         self.cleanup_interval = 3600  # 1 hour
         self.max_age_days = 30
@@ -20,23 +22,22 @@ class ImageManager:
         # Start cleanup task
         asyncio.create_task(self.cleanup_loop())
 
-    async def save_image(self, frame, plate_text: str, track_id: int) -> Optional[str]:
+    async def save_image(self, jpeg_bytes: bytes, plate_text: str, track_id: int) -> Optional[str]:
+        """Store an already JPEG-encoded plate image on disk and in the cache"""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"{plate_text}_{track_id}_{timestamp}.jpg"
             filepath = self.image_dir / filename
 
             # Save to disk
-            cv2.imwrite(str(filepath), frame)
+            async with aiofiles.open(filepath, 'wb') as f:
+                await f.write(jpeg_bytes)
             
             # Cache in Redis
-            _, img_encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            image_bytes = img_encoded.tobytes()
-            
-            self.redis_client.setex(
+            await self.redis_client.setex(
                 f"image:{filename}",
                 self.cache_ttl,
-                image_bytes
+                jpeg_bytes
             )
             
             return filename
@@ -44,32 +45,22 @@ class ImageManager:
             print(f"Error saving image: {str(e)}")
             return None
 
-    async def get_image(self, filename: str) -> Optional[bytes]:
+    async def get_cached_image(self, filename: str) -> Optional[bytes]:
+        """Image bytes from Redis, None on a miss or when Redis is unavailable"""
         try:
-            # Try cache first
-            cached = self.redis_client.get(f"image:{filename}")
-            if cached:
-                return cached
-            
-            # Read from disk
-            filepath = self.image_dir / filename
-            if await async_os.path.exists(filepath):
-                async with aiofiles.open(filepath, 'rb') as f:
-                    data = await f.read()
-                    
-                # Update cache
-                self.redis_client.setex(
-                    f"image:{filename}",
-                    self.cache_ttl,
-                    data
-                )
-                return data
-                
-            return None
+            return await self.redis_client.get(f"image:{filename}")
         except Exception as e:
-            print(f"Error retrieving image: {str(e)}")
+            print(f"Error reading image cache: {str(e)}")
             return None
 
+    async def stat_image(self, filename: str) -> Optional[os.stat_result]:
+        """Stat a plate image on disk so it can be streamed with sendfile"""
+        try:
+            stat_result = await async_os.stat(self.image_dir / filename)
+        except FileNotFoundError:
+            return None
+        return stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
     async def cleanup_loop(self):
         while True:
             try:
@@ -79,22 +70,33 @@ class ImageManager:
                 print(f"Cleanup error: {str(e)}")
 
     async def cleanup_old_images(self):
-        cutoff = datetime.now() - timedelta(days=self.max_age_days)
+        cutoff_ts = (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
         try:
-            # Changed from async for to regular for
-            for filepath in Path(self.image_dir).glob("*.jpg"):
-                try:
-                    stat = await async_os.stat(filepath)
-                    mtime = datetime.fromtimestamp(stat.st_mtime)
-                    
-                    if mtime < cutoff:
-                        await async_os.remove(filepath)
-                        self.redis_client.delete(f"image:{filepath.name}")
-                        print(f"Cleaned up old image: {filepath.name}")
-                        
-                except Exception as e:
-                    print(f"Error cleaning up {filepath}: {str(e)}")
+            # One directory walk off the event loop, DirEntry.is_file() needs no extra syscall
+            expired = await asyncio.to_thread(self._find_expired_images, cutoff_ts)
+            if not expired:
+                return
+            
+            results = await asyncio.gather(
+                *(async_os.remove(self.image_dir / name) for name in expired),
+                return_exceptions=True
+            )
+            for name, result in zip(expired, results):
+                if isinstance(result, Exception):
+                    print(f"Error cleaning up {name}: {str(result)}")
+            
+            # Drop all cached copies in a single round-trip
+            await self.redis_client.delete(*(f"image:{name}" for name in expired))
+            print(f"Cleaned up {len(expired)} old images")
         except Exception as e:
             print(f"Error in cleanup: {str(e)}")
 
+    def _find_expired_images(self, cutoff_ts: float) -> List[str]:
+        with os.scandir(self.image_dir) as entries:
+            return [
+                entry.name for entry in entries
+                if entry.name.endswith('.jpg') and entry.is_file()
+                and entry.stat().st_mtime < cutoff_ts
+            ]
+
 image_manager = ImageManager()
\ No newline at end of file
@@ -1,28 +1,57 @@
 # utils/preprocessing.py
 import cv2
 import numpy as np
+import threading
 
 class ImagePreprocessor:
+    _K3 = np.ones((3,3), np.uint8)
+    # CLAHE objects and scratch buffers hold per-call state, so each thread gets its own
+    _local = threading.local()
+
+    @classmethod
+    def _clahe(cls):
+        clahe = getattr(cls._local, 'clahe', None)
+        if clahe is None:
+            clahe = cls._local.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+        return clahe
+
+    @classmethod
+    def _buffers(cls, target_size):
+        """Per-thread resize/gray/threshold buffers, reallocated only when the size changes"""
+        buffers = getattr(cls._local, 'buffers', None)
+        if buffers is None or buffers[0] != target_size:
+            w, h = target_size
+            buffers = cls._local.buffers = (
+                target_size,
+                np.empty((h, w, 3), np.uint8),
+                np.empty((h, w), np.uint8),
+                np.empty((h, w), np.uint8)
+            )
+        return buffers[1:]
+
     @staticmethod
     def preprocess_plate(plate_img, target_size=(300, 100)):
         """Preprocess license plate image for OCR"""
         try:
+            resized, gray, thresh = ImagePreprocessor._buffers(tuple(target_size))
+            
             # Resize
-            plate_img = cv2.resize(plate_img, target_size)
+            cv2.resize(plate_img, target_size, dst=resized)
             
             # Convert to grayscale
-            gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+            cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=gray)
             
             # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
+            cv2.adaptiveThreshold(
                 gray, 255, 
                 cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY_INV, 11, 2
+                cv2.THRESH_BINARY_INV, 11, 2,
+                dst=thresh
             )
             
-            # Remove noise
-            kernel = np.ones((3,3), np.uint8)
-            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            # Remove noise, the result is the only fresh allocation since callers keep it.
+            # OpenCV already runs an all-ones rect kernel as separate row and column passes
+            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, ImagePreprocessor._K3)
             
             return cleaned
         except Exception as e:
@@ -35,11 +64,9 @@ class ImagePreprocessor:
         try:
             # Increase contrast
             lab = cv2.cvtColor(plate_img, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-            cl = clahe.apply(l)
-            enhanced = cv2.merge((cl,a,b))
-            enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+            # Equalize the L channel in place, no split/merge round trip
+            lab[:, :, 0] = ImagePreprocessor._clahe().apply(lab[:, :, 0])
+            enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
             
             return enhanced
         except Exception as e:
@@ -4,22 +4,20 @@ import numpy as np
 import json
 import os
 import time
-import traceback
 from typing import Optional, Tuple, List
+from config.settings import CONFIG
 
 class ROIManager:
     def __init__(self, config_path="config/roi_config.json"):
         self.config_path = config_path
+        self._debug = CONFIG.ROI_DEBUG
         self.roi = self.load_roi()
         self.drawing = False
         self.roi_points = []
         
         # Create debug directory
-        os.makedirs("debug_plates", exist_ok=True)
-        
-        # Prevent OpenCV windows
-        cv2.setNumThreads(1)
-        cv2.ocl.setUseOpenCL(False)
+        if self._debug:
+            os.makedirs("debug_plates", exist_ok=True)
 
     def load_roi(self) -> Optional[Tuple[int, int, int, int]]:
         """Load ROI from config file if exists"""
@@ -38,20 +36,13 @@ class ROIManager:
     def draw_roi(self, frame: np.ndarray) -> np.ndarray:
         """Draw ROI on frame"""
         if self.roi:
-            # Create semi-transparent overlay
-            overlay = frame.copy()
-            # Darken outside ROI
-            cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]),
-                        (0, 0, 0), -1)
-            # Clear ROI area
-            cv2.rectangle(overlay,
-                        (self.roi[0], self.roi[1]),
-                        (self.roi[2], self.roi[3]),
-                        (0, 0, 0), -1)
-            
-            # Apply overlay
-            alpha = 0.3
-            frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+            # Darken only the four bands outside the ROI, in place
+            h, w = frame.shape[:2]
+            x0, y0 = max(self.roi[0], 0), max(self.roi[1], 0)
+            x1, y1 = min(self.roi[2], w), min(self.roi[3], h)
+            for band in (frame[:y0], frame[y1:], frame[y0:y1, :x0], frame[y0:y1, x1:]):
+                if band.size:
+                    cv2.convertScaleAbs(band, dst=band, alpha=0.7)
             
             # Draw ROI border
             cv2.rectangle(frame,
@@ -71,45 +62,34 @@ class ROIManager:
         
         return frame
 
-    def calculate_intersection(self, bbox: Tuple[int, int, int, int]) -> float:
-        """Calculate intersection percentage of bbox with ROI"""
-        try:
-            if not self.roi:
-                return 0
-            
-            # Calculate areas
-            roi_area = (self.roi[2] - self.roi[0]) * (self.roi[3] - self.roi[1])
-            bbox_area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-            
-            # Calculate intersection rectangle
-            x1 = max(self.roi[0], bbox[0])
-            y1 = max(self.roi[1], bbox[1])
-            x2 = min(self.roi[2], bbox[2])
-            y2 = min(self.roi[3], bbox[3])
-            
-            if x1 < x2 and y1 < y2:
-                intersection_area = (x2 - x1) * (y2 - y1)
-                # Use bbox area as denominator
-                intersection_ratio = intersection_area / bbox_area
-                
-                # Print debug info
+    def intersection_ratios(self, bboxes: np.ndarray) -> np.ndarray:
+        """Intersection ratio of each (N, 4) bbox with the ROI, over the bbox area"""
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        roi = self.roi
+        if not roi or not len(bboxes):
+            return np.zeros(len(bboxes), dtype=np.float32)
+        
+        iw = np.minimum(roi[2], bboxes[:, 2]) - np.maximum(roi[0], bboxes[:, 0])
+        ih = np.minimum(roi[3], bboxes[:, 3]) - np.maximum(roi[1], bboxes[:, 1])
+        intersection = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+        bbox_area = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        ratios = intersection / np.clip(bbox_area, 1, None)
+        
+        if self._debug:
+            # Only boxes that overlap the ROI are worth a dump
+            for i in np.flatnonzero(ratios > 0):
+                bbox = tuple(int(v) for v in bboxes[i])
                 print(f"\nIntersection Debug:")
-                print(f"ROI: {self.roi}")
+                print(f"ROI: {roi}")
                 print(f"BBox: {bbox}")
-                print(f"Intersection Area: {intersection_area}")
-                print(f"BBox Area: {bbox_area}")
-                print(f"Ratio: {intersection_ratio}")
+                print(f"Intersection Area: {intersection[i]}")
+                print(f"BBox Area: {bbox_area[i]}")
+                print(f"Ratio: {ratios[i]}")
                 
                 # Save debug visualization without display
-                self.save_intersection_debug(bbox, intersection_ratio)
-                
-                return intersection_ratio
-            return 0
-                
-        except Exception as e:
-            print(f"Error calculating intersection: {str(e)}")
-            traceback.print_exc()
-            return 0
+                self.save_intersection_debug(bbox, float(ratios[i]))
+        
+        return ratios
 
     def save_intersection_debug(self, bbox: Tuple[int, int, int, int], ratio: float) -> None:
         """Save debug visualization of intersection"""
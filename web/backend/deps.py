@@ -0,0 +1,8 @@
+# web/backend/deps.py
+from database.db_operations import DatabaseManager
+
+# One manager for the whole backend: one engine, one write-behind buffer
+db_manager = DatabaseManager()
+
+async def get_db() -> DatabaseManager:
+    return db_manager
\ No newline at end of file
@@ -1,16 +1,21 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse, Response
 from pathlib import Path
 import cv2
 import uvicorn
+import asyncio
+import threading
+from concurrent import futures
 import sys
 import os
 from datetime import datetime, timedelta
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, List, Optional
+from collections import deque
 from database.db_operations import DatabaseManager
-from config.settings import Config
+from config.settings import CONFIG
 from core.detector import VehicleDetector
 from core.tracker import VehicleTracker
 from core.ocr_engine import OCREngine
@@ -18,14 +23,20 @@ from utils.roi_utils import ROIManager
 import numpy as np
 from .websocket import manager, ConnectionManager
 from .middleware import RateLimiter
+from .webrtc import webrtc_manager, WEBRTC_AVAILABLE
+from .deps import db_manager, get_db
 from utils.image_manager import image_manager
 
+# libjpeg-turbo's SIMD encoder when available, OpenCV's libjpeg otherwise
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420, TJFLAG_FASTDCT
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbo_jpeg = None
+
 class VideoCamera:
     def __init__(self, source=0):
-        cv2.setNumThreads(1)
-        cv2.ocl.setUseOpenCL(False)
-        
-        self.cap = cv2.VideoCapture(source)
+        self.cap, decimated = self._open_capture(source)
         if not self.cap.isOpened():
             raise RuntimeError(f"Failed to open video source: {source}")
             
@@ -35,95 +46,281 @@ class VideoCamera:
         self.tracker = VehicleTracker()
         self.ocr_engine = OCREngine()
         self.roi_manager = ROIManager()
-        self.db_manager = DatabaseManager()
+        self.db_manager = db_manager
         
         self.frame_count = 0
-        self.skip_frames = 2  
+        # A rate-limited GStreamer pipeline already drops frames before decode
+        self.skip_frames = 1 if decimated else 2
+        # Processed frames are published at the rate they were captured, not in batch bursts
+        source_fps = CONFIG.CAPTURE_FRAMERATE if decimated else (self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self._publish_interval = self.skip_frames / source_fps
+        self.batch_size = min(CONFIG.DETECTION_BATCH_SIZE, CONFIG.MAX_DETECTION_BATCH_SIZE)
+        # Reused staging buffers for plate crops, one per pending track of a batch
+        self._plate_slots: List[np.ndarray] = []
+        
+        # Frames are produced by a capture thread, slow clients only ever see the newest one
+        self._latest_frame = deque(maxlen=1)
+        self._latest_raw = deque(maxlen=1)
+        self.mjpeg_clients = 0
+        self._frame_ready: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._capture_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._finished = False
         
     def __del__(self):
         if hasattr(self, 'cap') and self.cap is not None:
             self.cap.release()
 
+    @staticmethod
+    def _open_capture(source):
+        """Open the source, decimated at the decoder when a capture framerate is configured"""
+        if CONFIG.CAPTURE_FRAMERATE and isinstance(source, str):
+            uri = source if '://' in source else Path(source).resolve().as_uri()
+            pipeline = (
+                f"uridecodebin uri={uri} ! videorate drop-only=true ! "
+                f"video/x-raw,framerate={CONFIG.CAPTURE_FRAMERATE}/1 ! "
+                "videoconvert ! video/x-raw,format=BGR ! appsink drop=true max-buffers=1"
+            )
+            cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+            if cap.isOpened():
+                return cap, True
+            print("GStreamer pipeline unavailable, falling back to default capture")
+        return cv2.VideoCapture(source), False
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Run capture and processing in a worker thread, off the event loop"""
+        self._loop = loop
+        self._frame_ready = asyncio.Condition()
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop, name='video-capture', daemon=True
+        )
+        self._capture_thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=5)
+
     async def get_frame(self) -> Optional[bytes]:
-        if not self.cap.isOpened():
+        """Wait for the next JPEG frame published by the capture thread"""
+        return await self._next_frame(self._latest_frame)
+
+    async def get_raw_frame(self) -> Optional[np.ndarray]:
+        """Wait for the next annotated BGR frame, for the WebRTC track"""
+        return await self._next_frame(self._latest_raw)
+
+    async def _next_frame(self, latest: deque):
+        async with self._frame_ready:
+            while not self._finished:
+                await self._frame_ready.wait()
+                if latest and latest[-1] is not None:
+                    return latest[-1]
             return None
-            
-        self.frame_count += 1
+
+    async def _publish(self, frame_bytes: Optional[bytes], frame: Optional[np.ndarray]) -> None:
+        async with self._frame_ready:
+            self._latest_frame.append(frame_bytes)
+            self._latest_raw.append(frame)
+            self._frame_ready.notify_all()
+
+    async def _publish_batch(self, encoded_frames: List[Optional[bytes]],
+                             frames: List[np.ndarray]) -> None:
+        """Spread a detection batch over its capture interval instead of bursting it"""
+        for frame_bytes, frame in zip(encoded_frames, frames):
+            await self._publish(frame_bytes, frame)
+            await asyncio.sleep(self._publish_interval)
+
+    def _capture_loop(self) -> None:
+        publishing = None
+        try:
+            while not self._stop_event.is_set() and self.cap.isOpened():
+                frames = self._process_batch()
+                if not frames:
+                    break
+                
+                # Encode once for all MJPEG clients, and not at all when only WebRTC is watching
+                encoded_frames = [self._encode_frame(frame) if self.mjpeg_clients else None
+                                  for frame in frames]
+                
+                if publishing is not None:
+                    # Only blocks when processing outruns real time, e.g. file sources
+                    futures.wait([publishing], timeout=len(frames) * self._publish_interval + 1)
+                publishing = asyncio.run_coroutine_threadsafe(
+                    self._publish_batch(encoded_frames, frames), self._loop
+                )
+        except Exception as e:
+            print(f"Capture loop error: {str(e)}")
+        finally:
+            if publishing is not None:
+                # Let the last batch play out before ending the streams
+                futures.wait([publishing], timeout=self.batch_size * self._publish_interval + 1)
+            # Wake every waiting client so their streams can end
+            self._finished = True
+            if not self._loop.is_closed():
+                asyncio.run_coroutine_threadsafe(self._publish(None, None), self._loop)
+
+    def _process_batch(self) -> List[np.ndarray]:
+        """Buffer frames until a full detection batch is ready, then process them in order"""
+        buffered = []
         
-        if self.frame_count % self.skip_frames != 0:
-            ret, frame = self.cap.read()
-            if not ret:
-                return None
-            return self._encode_frame(frame)
+        while len(buffered) < self.batch_size and self.cap.isOpened():
+            self.frame_count += 1
+            if self.frame_count % self.skip_frames != 0:
+                # Advance past skipped frames without colour conversion or re-encoding
+                if not self.cap.grab():
+                    break
+                continue
             
-        success, frame = self.cap.read()
-        if not success:
-            return None
+            success, frame = self.cap.read()
+            if not success:
+                break
+            buffered.append(frame)
+        
+        batch_detections = self.detector.detect_and_track_batch(buffered) if buffered else []
+        
+        # Plate crops from every frame of the batch, one per track, read in a single OCR pass
+        pending = {}
+        frames = [
+            self._process_frame(frame, detections, pending)
+            for frame, detections in zip(buffered, batch_detections)
+        ]
+        self._read_plates(list(pending.values()))
+        
+        return frames
 
+    def _process_frame(self, frame: np.ndarray, detections: list, pending: dict) -> np.ndarray:
+        """Update tracks from one frame's detections, queue plate crops and annotate the frame"""
         try:
-            detections = self.detector.detect_and_track(frame)
+            self.tracker.build_index()
             
-            for detection in detections:
-                if detection['class'] == 'license_plate':
-                    bbox = detection['bbox']
-                    detection_confidence = detection['confidence']
-                    axle_count = detection.get('axle_count', 2)
-                    
-                    track = self.tracker.get_track(
-                        detection['track_id'], 
-                        bbox,
-                        detection_confidence,
-                        axle_count
-                    )
-                    
-                    intersection = self.roi_manager.calculate_intersection(bbox)
-                    in_roi = intersection > Config.ROI_INTERSECTION_THRESHOLD
+            plates = [d for d in detections if d['class'] == 'license_plate']
+            # ROI overlap for every plate of the frame in one vectorized pass
+            intersections = self.roi_manager.intersection_ratios([d['bbox'] for d in plates])
+            
+            # Collect plate crops for every track that still needs a read
+            for detection, intersection in zip(plates, intersections):
+                bbox = detection['bbox']
+                detection_confidence = detection['confidence']
+                axle_count = detection.get('axle_count', 2)
+                
+                track = self.tracker.get_track(
+                    detection['track_id'], 
+                    bbox,
+                    detection_confidence,
+                    axle_count
+                )
+                
+                if not track.needs_ocr():
+                    continue
+                
+                in_roi = intersection > CONFIG.ROI_INTERSECTION_THRESHOLD
+                
+                if track.should_process(in_roi):
+                    plate_img = self.detector.extract_plate(frame, bbox)
                     
-                    if track.should_process(in_roi):
-                        plate_img = self.detector.extract_plate(frame, bbox)
-                        
-                        if plate_img is not None:
-                            text, confidence = self.ocr_engine.process_plate(plate_img, track.track_id)
-                            
-                            if text and confidence > 0:
-                                if track.update_plate(text, confidence, plate_img):
-                                    frame_path = await image_manager.save_image(
-                                        track.best_plate_image,
-                                        text,
-                                        track.track_id
-                                    )
-                                    
-                                    if frame_path:
-                                        track.frame_path = frame_path
-                                        vehicle_data = await self.db_manager.add_vehicle_detection(
-                                            track_id=track.track_id,
-                                            license_plate=text,
-                                            confidence=confidence,
-                                            frame_path=frame_path,
-                                            axle_count=axle_count
-                                        )
-                                        if vehicle_data:
-                                            await manager.broadcast_vehicle_update(vehicle_data)
+                    if plate_img is not None:
+                        # Staged, the frame is annotated before the batch is read;
+                        # a later frame's crop of the same track reuses its slot
+                        queued = pending.get(track.track_id)
+                        slot = queued[3] if queued else len(pending)
+                        staged = self._stage_plate(slot, plate_img)
+                        pending[track.track_id] = (track, staged, axle_count, slot)
             
             if self.roi_manager.roi:
                 frame = self.roi_manager.draw_roi(frame)
             frame = self.tracker.draw_tracks(frame)
             
-            return self._encode_frame(frame)
+            return frame
             
         except Exception as e:
             print(f"Frame processing error: {str(e)}")
-            return self._encode_frame(frame)
+            return frame
+
+    def _stage_plate(self, slot: int, plate_img: np.ndarray) -> np.ndarray:
+        """Copy a crop into a reusable slot, growing it only for a larger plate"""
+        h, w = plate_img.shape[:2]
+        if slot == len(self._plate_slots):
+            self._plate_slots.append(np.empty((h, w, 3), np.uint8))
+        buffer = self._plate_slots[slot]
+        if buffer.shape[0] < h or buffer.shape[1] < w:
+            buffer = self._plate_slots[slot] = np.empty(
+                (max(h, buffer.shape[0]), max(w, buffer.shape[1]), 3), np.uint8
+            )
+        
+        staged = buffer[:h, :w]
+        np.copyto(staged, plate_img)
+        return staged
+
+    def _read_plates(self, pending: list) -> None:
+        """Run one batched OCR pass and persist reads that lock or improve a track"""
+        if not pending:
+            return
+        
+        try:
+            texts, confidences = self.ocr_engine.process_plates_batch(
+                [plate_img for _, plate_img, _, _ in pending],
+                [track.track_id for track, _, _, _ in pending]
+            )
+            
+            for (track, plate_img, axle_count, _), text, confidence in zip(pending, texts, confidences):
+                if text and confidence > 0:
+                    if track.update_plate(text, confidence, plate_img):
+                        # Encode here, persistence and broadcast happen on the event loop
+                        jpeg_bytes = self._encode_frame(track.best_plate_image)
+                        if jpeg_bytes is not None:
+                            asyncio.run_coroutine_threadsafe(
+                                self._save_plate(track, jpeg_bytes, text, confidence, axle_count),
+                                self._loop
+                            )
+        except Exception as e:
+            print(f"Plate OCR error: {str(e)}")
+
+    async def _save_plate(self, track, jpeg_bytes: bytes, text: str,
+                          confidence: float, axle_count: int) -> None:
+        """Persist a locked plate read and notify connected clients"""
+        try:
+            # The same encoded bytes go to disk and to the cache
+            frame_path = await image_manager.save_image(
+                jpeg_bytes,
+                text,
+                track.track_id
+            )
+            
+            if frame_path:
+                track.frame_path = frame_path
+                # Only buffers the row, the write-behind thread does the I/O
+                if self.db_manager.add_vehicle_detection(
+                    track_id=track.track_id,
+                    license_plate=text,
+                    confidence=confidence,
+                    frame_path=frame_path,
+                    axle_count=axle_count
+                ):
+                    await manager.broadcast_vehicle_update({
+                        "track_id": track.track_id,
+                        "license_plate": text,
+                        "confidence": float(confidence),
+                        "frame_path": frame_path,
+                        "axle_count": axle_count
+                    })
+        except Exception as e:
+            print(f"Error saving plate for track {track.track_id}: {str(e)}")
 
     def _encode_frame(self, frame: np.ndarray) -> bytes:
         try:
+            if _turbo_jpeg is not None:
+                return _turbo_jpeg.encode(
+                    frame, quality=85, pixel_format=TJPF_BGR,
+                    jpeg_subsample=TJSAMP_420, flags=TJFLAG_FASTDCT
+                )
             ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
             return buffer.tobytes() if ret else None
         except Exception as e:
             print(f"Frame encoding error: {str(e)}")
             return None
 
-app = FastAPI(title="License Plate Detection System")
+app = FastAPI(title="License Plate Detection System", default_response_class=ORJSONResponse)
 
 app.middleware("http")(RateLimiter())
 
@@ -136,7 +333,6 @@ app.add_middleware(
     expose_headers=["Content-Type", "Content-Length"]
 )
 
-db_manager = DatabaseManager()
 camera: Optional[VideoCamera] = None
 
 app.mount("/plates", StaticFiles(directory="plates"), name="plates")
@@ -148,24 +344,31 @@ async def startup_event():
     if len(sys.argv) > 2 and sys.argv[1] == '-v':
         video_source = sys.argv[2]
     camera = VideoCamera(video_source)
+    camera.start(asyncio.get_running_loop())
     print(f"Application started, camera initialized with source: {video_source}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     global camera
+    await webrtc_manager.close()
     if camera:
+        camera.stop()
         del camera
         camera = None
     print("Application shutting down, camera released")
 
 async def gen_frames() -> AsyncIterator[bytes]:
     global camera
-    while True:
-        frame = await camera.get_frame()
-        if frame is None:
-            break
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    camera.mjpeg_clients += 1
+    try:
+        while True:
+            frame = await camera.get_frame()
+            if frame is None:
+                break
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    finally:
+        camera.mjpeg_clients -= 1
 
 @app.get("/")
 async def root():
@@ -182,6 +385,19 @@ async def video_feed():
         media_type='multipart/x-mixed-replace; boundary=frame'
     )
 
+@app.post("/api/webrtc/offer")
+async def webrtc_offer(offer: dict):
+    if not WEBRTC_AVAILABLE:
+        raise HTTPException(status_code=503, detail="WebRTC not available, use /video_feed")
+    try:
+        if not camera:
+            raise HTTPException(status_code=500, detail="Camera not initialized")
+        return await webrtc_manager.handle_offer(camera, offer["sdp"], offer["type"])
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -192,27 +408,29 @@ async def websocket_endpoint(websocket: WebSocket):
         manager.disconnect(websocket)
 
 @app.get("/api/vehicles/recent")
-async def get_recent_vehicles():
+async def get_recent_vehicles(db: DatabaseManager = Depends(get_db)):
     try:
-        vehicles = await db_manager.get_recent_vehicles(minutes=30)
+        # Sync SQLite queries run in the thread pool, off the event loop
+        vehicles = await run_in_threadpool(db.get_recent_vehicles, minutes=30)
         await manager.broadcast_vehicle_update({"vehicles": vehicles})
         return vehicles
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/statistics")
-async def get_statistics():
+async def get_statistics(db: DatabaseManager = Depends(get_db)):
     try:
-        stats = await db_manager.get_statistics()
+        stats = await run_in_threadpool(db.get_statistics)
         await manager.broadcast_statistics(stats)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/vehicles/search/{plate}")
-async def search_vehicles(plate: str):
+async def search_vehicles(plate: str, contains: bool = False,
+                          db: DatabaseManager = Depends(get_db)):
     try:
-        vehicles = await db_manager.search_vehicles(plate)
+        vehicles = await run_in_threadpool(db.search_vehicles, plate, contains=contains)
         return vehicles
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -220,10 +438,23 @@ async def search_vehicles(plate: str):
 @app.get("/api/images/{filename}")
 async def get_image(filename: str):
     try:
-        image_data = await image_manager.get_image(filename)
-        if image_data is None:
+        # Plate filenames are timestamped and never rewritten, so clients may cache them
+        headers = {"Cache-Control": f"public, max-age={image_manager.cache_ttl}"}
+        
+        image_data = await image_manager.get_cached_image(filename)
+        if image_data is not None:
+            return Response(content=image_data, media_type="image/jpeg", headers=headers)
+        
+        # Cache miss: let Starlette stream the file with sendfile, with ETag/Last-Modified from the stat
+        stat_result = await image_manager.stat_image(filename)
+        if stat_result is None:
             raise HTTPException(status_code=404, detail="Image not found")
-        return Response(content=image_data, media_type="image/jpeg")
+        return FileResponse(
+            image_manager.image_dir / filename,
+            media_type="image/jpeg",
+            headers=headers,
+            stat_result=stat_result
+        )
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -1,15 +1,26 @@
 # web/backend/middleware.py
 import time
 from fastapi import Request, Response
-import redis
+from redis import asyncio as aioredis
 from typing import Callable
 import json
 
+# Count the request and start the window on the first hit, in one atomic round-trip
+RATE_LIMIT_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return current
+"""
+
 class RateLimiter:
     def __init__(self):
-        self.redis = redis.Redis(host='localhost', port=6379, db=0)
+        self.redis = aioredis.Redis(host='localhost', port=6379, db=0)
         self.rate_limit = 100  # requests per minute
         self.window = 60  # seconds
+        # Sent by SHA with EVALSHA, loaded into Redis only when it is missing
+        self._rate_limit_script = self.redis.register_script(RATE_LIMIT_SCRIPT)
 
     async def __call__(self, request: Request, call_next: Callable) -> Response:
         client_ip = request.client.host
@@ -19,15 +30,11 @@ class RateLimiter:
         if "upgrade" in request.headers and request.headers["upgrade"].lower() == "websocket":
             return await call_next(request)
             
-        current = self.redis.get(key)
-        if current is None:
-            self.redis.setex(key, self.window, 1)
-        elif int(current) >= self.rate_limit:
+        request_count = await self._rate_limit_script(keys=[key], args=[self.window])
+        if request_count > self.rate_limit:
             return Response(
                 content=json.dumps({"detail": "Rate limit exceeded"}),
                 status_code=429
             )
-        else:
-            self.redis.incr(key)
         
         return await call_next(request)
\ No newline at end of file
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from ..schemas import VehicleResponse, Statistics
 from database.db_operations import DatabaseManager
+from ..deps import get_db
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 
 router = APIRouter()
-db_manager = DatabaseManager()
 
+# Plain def, so FastAPI runs the sync SQLite queries in its thread pool
 @router.get("/vehicles/recent", response_model=List[VehicleResponse])
-async def get_recent_vehicles():
+def get_recent_vehicles(db: DatabaseManager = Depends(get_db)):
     try:
-        vehicles = db_manager.get_recent_vehicles(minutes=30)
+        vehicles = db.get_recent_vehicles(minutes=30)
         # Sort by confidence, highest first
         vehicles.sort(key=lambda x: x.get('confidence', 0), reverse=True)
         return vehicles
@@ -20,16 +21,17 @@ async def get_recent_vehicles():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/statistics")
-async def get_statistics():
+def get_statistics(db: DatabaseManager = Depends(get_db)):
     try:
-        return db_manager.get_statistics()
+        return db.get_statistics()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/vehicles/search/{plate}")
-async def search_vehicles(plate: str):
+def search_vehicles(plate: str, contains: bool = False,
+                    db: DatabaseManager = Depends(get_db)):
     try:
-        return db_manager.search_vehicles(plate)
+        return db.search_vehicles(plate, contains=contains)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
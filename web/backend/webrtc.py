@@ -0,0 +1,71 @@
+# web/backend/webrtc.py
+import asyncio
+from typing import Set
+
+# aiortc is optional, without it only the MJPEG feed is served
+try:
+    from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+    from aiortc.contrib.media import MediaRelay
+    from aiortc.mediastreams import MediaStreamError
+    from av import VideoFrame
+    WEBRTC_AVAILABLE = True
+except ImportError:
+    VideoStreamTrack = object
+    WEBRTC_AVAILABLE = False
+
+class CameraVideoTrack(VideoStreamTrack):
+    """Video track fed by the annotated frames the capture thread publishes"""
+    kind = "video"
+
+    def __init__(self, camera):
+        super().__init__()
+        self.camera = camera
+
+    async def recv(self):
+        pts, time_base = await self.next_timestamp()
+        frame = await self.camera.get_raw_frame()
+        if frame is None:
+            self.stop()
+            raise MediaStreamError
+        
+        video_frame = VideoFrame.from_ndarray(frame, format="bgr24")
+        video_frame.pts = pts
+        video_frame.time_base = time_base
+        return video_frame
+
+class WebRTCManager:
+    def __init__(self):
+        self.peer_connections: Set = set()
+        self._relay = None
+        self._track = None
+
+    async def handle_offer(self, camera, sdp: str, sdp_type: str) -> dict:
+        """Answer a browser offer with a subscription to the shared camera track"""
+        if self._track is None or self._track.camera is not camera:
+            # One source track, relayed so every peer pulls the same frames
+            self._relay = MediaRelay()
+            self._track = CameraVideoTrack(camera)
+        
+        pc = RTCPeerConnection()
+        self.peer_connections.add(pc)
+
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            if pc.connectionState in ("failed", "closed"):
+                await pc.close()
+                self.peer_connections.discard(pc)
+
+        pc.addTrack(self._relay.subscribe(self._track))
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=sdp_type))
+        answer = await pc.createAnswer()
+        await pc.setLocalDescription(answer)
+        return {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}
+
+    async def close(self) -> None:
+        await asyncio.gather(*(pc.close() for pc in self.peer_connections), return_exceptions=True)
+        self.peer_connections.clear()
+        self._relay = None
+        self._track = None
+
+# Create global instance
+webrtc_manager = WebRTCManager()
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import WebSocket
 from typing import List, Dict
-import json
+import orjson
 import asyncio
 
 class ConnectionManager:
@@ -12,7 +12,7 @@ class ConnectionManager:
         await websocket.accept()
         self.active_connections.append(websocket)
         if self.last_vehicle_data:
-            await websocket.send_json(self.last_vehicle_data)
+            await websocket.send_text(self._dumps(self.last_vehicle_data))
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
@@ -21,25 +21,37 @@ class ConnectionManager:
     async def broadcast_vehicle_update(self, vehicle_data: dict):
         """Broadcast vehicle detection updates to all clients"""
         self.last_vehicle_data = vehicle_data
-        for connection in self.active_connections.copy():
-            try:
-                await connection.send_json({
-                    "type": "vehicle_update",
-                    "data": vehicle_data
-                })
-            except Exception:
-                await self.disconnect(connection)
+        await self._broadcast({
+            "type": "vehicle_update",
+            "data": vehicle_data
+        })
 
     async def broadcast_statistics(self, stats_data: dict):
         """Broadcast statistics updates to all clients"""
-        for connection in self.active_connections.copy():
-            try:
-                await connection.send_json({
-                    "type": "statistics_update",
-                    "data": stats_data
-                })
-            except Exception:
-                await self.disconnect(connection)
+        await self._broadcast({
+            "type": "statistics_update",
+            "data": stats_data
+        })
+
+    @staticmethod
+    def _dumps(message: dict) -> str:
+        """orjson with NumPy scalars allowed, as text so clients keep parsing JSON"""
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    async def _broadcast(self, message: dict):
+        """Serialize once and send to every client concurrently"""
+        connections = self.active_connections.copy()
+        if not connections:
+            return
+        
+        payload = self._dumps(message)
+        results = await asyncio.gather(
+            *(connection.send_text(payload) for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
 # Create global instance
 manager = ConnectionManager()
\ No newline at end of file